@@ -1,10 +1,17 @@
 import os
 import sys
+import queue
 import shutil
+import time
 import subprocess
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from threading import Thread
+from threading import Thread, local
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 """
 Filename: Stage_Project.py
@@ -36,44 +43,308 @@ Notes:
 - This script copies the entire project structure into a new folder, which you should use to run the Deployment option on.
 - The directory used is the same as the project's main directory. 
 - *** USE WITH CAUTION *** It will erase any existing directory in the staging folder with that name if it already exists. 
+- With "Only copy changed files" checked, the existing staging directory is updated in place instead: unchanged files are
+  skipped and files no longer in the project are removed from it.
 - It is designed to work with the accompanying Unused_assets.py, which removes unused assets from your project.
 - Don't forget to open the staging directory project as the current project before deployment :)
 """
 
-def copy_game_to_staging(repo_path, staging_path, skip_dirs, progress_callback):
-    """Copies the game from the repository to the staging folder."""
+# Directories that are never staged. _walk prunes these by name, so they are not even listed.
+SKIP_DIRS = frozenset({'.git', '.vs', 'DatabaseCleanUpTool', 'save'})
+
+# Chunk size for the buffered copy, only used when the kernel copy calls are unavailable.
+# 1 MiB keeps the read/write syscall count low without holding much memory per copy thread.
+COPY_BUFFER_SIZE = 1 << 20
+
+# ioctl request for a copy-on-write clone of a whole file, from linux/fs.h
+FICLONE = 0x40049409
+
+_copy_buffers = local()  # One reusable copy buffer per copy thread
+
+if sys.platform == 'darwin':
+    # APFS clones a file instantly with clonefile(2), which Python doesn't wrap
+    import ctypes
+    _clonefile = ctypes.CDLL(None, use_errno=True).clonefile
+    _clonefile.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32)
+    _clonefile.restype = ctypes.c_int
+else:
+    _clonefile = None
+
+def _copy_buffered(fsrc, fdst):
+    """Copies the rest of fsrc into fdst, reusing this thread's buffer instead of allocating per chunk."""
+    buf = getattr(_copy_buffers, 'buf', None)
+    if buf is None:
+        buf = _copy_buffers.buf = memoryview(bytearray(COPY_BUFFER_SIZE))
+    while True:
+        read = fsrc.readinto(buf)
+        if not read:
+            break
+        fdst.write(buf[:read])
+
+def _fastcopy(src, dst, clone=False):
+    """
+    Copies a single file, keeping the data in the kernel on Linux.
+
+    With clone set (source and destination on the same filesystem), a copy-on-write
+    clone is tried first on btrfs/xfs (FICLONE) and APFS (clonefile), which shares
+    the data blocks instead of copying them.
+    """
+    if sys.platform != 'linux':
+        if clone and _clonefile is not None and _clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0:
+            return
+        shutil.copyfile(src, dst)
+        return
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fd_in, fd_out = fsrc.fileno(), fdst.fileno()
+        if clone:
+            try:
+                fcntl.ioctl(fd_out, FICLONE, fd_in)
+                return
+            except OSError:
+                pass  # EOPNOTSUPP/EXDEV/EINVAL: this filesystem can't clone, copy the data instead
+        size = os.fstat(fd_in).st_size
+        offset = 0
+        # Each method carries on from where the previous one stopped. copy_file_range and
+        # sendfile can return 0 before the end instead of failing (some FUSE and network
+        # filesystems do), which counts as stopping too, so a short copy is never kept.
+        try:
+            # copy_file_range can reflink on btrfs/xfs and copy server-side on NFS
+            while offset < size:
+                copied = os.copy_file_range(fd_in, fd_out, size - offset)
+                if not copied:
+                    break
+                offset += copied
+        except (AttributeError, OSError):
+            pass  # Not supported by this kernel/filesystem
+        if offset < size:
+            try:
+                while offset < size:
+                    sent = os.sendfile(fd_out, fd_in, offset, size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+            except OSError:
+                pass
+        if offset < size:
+            # Last resort: a plain buffered copy of the remainder, read until EOF
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            _copy_buffered(fsrc, fdst)
+
+def _walk(path, skip_dirs, onerror=None):
+    """
+    Yields (directory, file entries) for path and every subdirectory not named in skip_dirs.
+
+    Uses os.scandir so file-vs-directory checks come from the cached directory
+    entry instead of a stat call per file. Like os.walk, a directory that can't
+    be listed is skipped, and the OSError is passed to onerror if one is given.
+    """
+    files = []
+    subdirs = []
     try:
-        
-        if os.path.exists(staging_path):
-            shutil.rmtree(staging_path)
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    # Like os.walk, symlinked directories are neither followed nor copied
+                    if entry.name not in skip_dirs and not entry.is_symlink():
+                        subdirs.append(entry.path)
+                else:
+                    files.append(entry)
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+        return
+    yield path, files
+    for subdir in subdirs:
+        yield from _walk(subdir, skip_dirs, onerror)
+
+def _on_rotational_disk(path):
+    """Returns True if path is on a spinning disk, as reported by Linux sysfs."""
+    if sys.platform != 'linux':
+        return False
+    st_dev = os.stat(path).st_dev
+    device = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+    # Partitions don't have their own queue directory, their parent disk does
+    for queue_dir in (os.path.join(device, 'queue'), os.path.join(device, '..', 'queue')):
+        try:
+            with open(os.path.join(queue_dir, 'rotational')) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return False
 
-        def copy_with_progress(src, dst):
-            
-            try:
-                with open(src, "rb") as fsrc:
-                    with open(dst, "wb") as fdst:
-                        while True:
-                            buf = fsrc.read(4096)
-                            if not buf:
-                                break
-                            fdst.write(buf)
-                progress_callback()  # Call progress_callback after copying each file
-            except Exception:
-                print(f"Error: {Exception}")
-
-        for root, _, files in os.walk(repo_path):
-            relative_path = os.path.relpath(root, repo_path)
-            if any(dir_to_skip in relative_path.split(os.sep) for dir_to_skip in skip_dirs):
-                continue
-            os.makedirs(os.path.join(staging_path, relative_path), exist_ok=True)
-            for file in files:
-                src_path = os.path.join(root, file)
-                dst_path = os.path.join(staging_path, relative_path, file)
-                copy_with_progress(src_path, dst_path)  # Call copy_with_progress with src and dst paths
+def _is_within(path, directory):
+    """Returns True if path is directory itself or lies anywhere inside it, after resolving symlinks."""
+    path = os.path.normcase(os.path.realpath(path))
+    directory = os.path.normcase(os.path.realpath(directory))
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:  # On different drives on Windows
+        return False
 
+def _is_unchanged(entry, dst):
+    """Returns True if dst already has the same size and modification time as the source entry."""
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_stat = entry.stat(follow_symlinks=False)
+    # Whole seconds only, since FAT/exFAT staging drives round timestamps
+    return dst_stat.st_size == src_stat.st_size and int(dst_stat.st_mtime) == int(src_stat.st_mtime)
+
+def _stage_file(entry, dst, clone=False):
+    """Copies one file into the staging folder, keeping the source timestamps for later incremental runs."""
+    _fastcopy(entry.path, dst, clone)
+    src_stat = entry.stat(follow_symlinks=False)
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+def copy_game_to_staging(repo_path, staging_path, skip_dirs, progress_callback, incremental=False):
+    """
+    Copies the game from the repository to the staging folder.
+
+    With incremental set, an existing staging folder is kept: files whose size and
+    modification time already match are not copied again, and staged files and
+    folders that no longer exist in the repository are removed.
+
+    Returns False, after printing why, if the game couldn't be staged.
+    """
+    try:
+        skip_dirs = frozenset(skip_dirs)  # No-op for SKIP_DIRS, but keeps name checks O(1) for list callers
+        staging_root = os.path.abspath(staging_path)
+        # The old staging folder is renamed and deleted below, so never let that be the repository
+        if _is_within(staging_root, repo_path):
+            print(f"Refusing to stage into {staging_root}: it is the repository or a folder inside it")
+            return False
+        if os.path.exists(staging_root) and not incremental:
+            # Renaming is a single metadata operation, so the new copy can start right away
+            # while the old staging folder is deleted in the background. The thread is not a
+            # daemon so the deletion still finishes if the window is closed first.
+            trash = f"{staging_root}.old.{os.getpid()}.{time.time_ns()}"
+            os.rename(staging_root, trash)
+            Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}).start()
+
+        copy_jobs = []
+        failures = []  # Repository folders that couldn't be listed and files that couldn't be copied
+        staged_files = set()
+        total_bytes = 0
+        created_dirs = set()
+
+        def ensure_dir(path):
+            """Creates a destination directory, skipping ones already created this run."""
+            if path in created_dirs:
+                return
+            os.makedirs(path, exist_ok=True)
+            created_dirs.add(path)
+
+        def walk_error(e):
+            """Records a repository folder that couldn't be listed, so the copy isn't reported as complete."""
+            print(f"Error listing {e.filename}: {e}")
+            failures.append(e.filename)
+
+        # Every destination directory is created here, before any copy is submitted,
+        # so the copy threads never call makedirs concurrently.
+        for root, files in _walk(repo_path, skip_dirs, walk_error):
+            relative_path = os.path.relpath(root, repo_path)
+            dst_dir = staging_root if relative_path == '.' else os.path.join(staging_root, relative_path)
+            ensure_dir(dst_dir)
+            for entry in files:
+                dst_path = os.path.join(dst_dir, entry.name)
+                if incremental:
+                    staged_files.add(dst_path)
+                    if _is_unchanged(entry, dst_path):
+                        continue
+                copy_jobs.append((entry, dst_path))
+                # Free on Windows, where the size comes with the directory listing
+                total_bytes += entry.stat(follow_symlinks=False).st_size
+
+        # On a hard drive, copying in inode order roughly follows the on-disk layout and cuts seeking.
+        # The inode comes from the directory listing on Linux, so this costs no extra syscalls.
+        if _on_rotational_disk(repo_path):
+            copy_jobs.sort(key=lambda job: job[0].inode())
+
+        # Reflinks only work within one filesystem, so only try them when both sides share a device
+        clone = os.stat(repo_path).st_dev == os.stat(staging_root).st_dev
+
+        # Threads are enough here since the GIL is released while waiting on I/O.
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_stage_file, entry, dst, clone): entry for entry, dst in copy_jobs}
+            # The walk above already counted the files, so no separate pre-scan is needed for the progress total
+            copied_bytes = 0
+            for copied_files, future in enumerate(as_completed(futures), start=1):
+                entry = futures[future]
+                try:
+                    future.result()
+                except OSError as e:
+                    print(f"Error copying {entry.path}: {e}")
+                    failures.append(entry.path)
+                copied_bytes += entry.stat(follow_symlinks=False).st_size
+                # Call progress_callback after copying each file
+                progress_callback(copied_files, len(copy_jobs), copied_bytes, total_bytes)
+        if not copy_jobs:
+            # Nothing changed since the last run, so report the copy as complete
+            progress_callback(0, 0, 0, 0)
+
+        if incremental:
+            print(f"{len(staged_files) - len(copy_jobs)} unchanged files skipped")
+        # Everything staged from a folder that couldn't be listed would look stale, so only clean up after a full walk
+        if incremental and not failures:
+            # Remove staged files and folders that were deleted or renamed in the repository since the last run
+            stale_dirs = []
+            for root, files in _walk(staging_root, skip_dirs, lambda e: print(f"Error listing {e.filename}: {e}")):
+                if root not in created_dirs:
+                    stale_dirs.append(root)
+                for entry in files:
+                    if entry.path not in staged_files:
+                        try:
+                            os.remove(entry.path)
+                        except OSError as e:
+                            print(f"Error removing stale {entry.path}: {e}")
+            # The walk lists each folder before its subfolders, so reversed the subfolders are emptied first
+            for stale_dir in reversed(stale_dirs):
+                try:
+                    os.rmdir(stale_dir)
+                except OSError as e:
+                    print(f"Error removing stale {stale_dir}: {e}")
+
+        if failures:
+            print(f"Game partly copied to staging: {len(failures)} files or folders couldn't be copied")
+            return False
         print(f"Game copied to staging: {staging_path}")
+        return True
     except Exception as e:
         print(f"Error copying game to staging: {e}")
+        return False
+
+def get_current_directory():
+    """Gets the current directory of the running script."""
+    if getattr(sys, 'frozen', False):
+        # If the script is packaged into an executable, use this
+        return os.path.dirname(sys.executable)
+    else:
+        # If the script is running as a .py file, use this
+        return os.path.dirname(os.path.abspath(__file__))
+
+def run_unused_assets(staging_path):
+    """
+    Hands the staging folder over to Unused_assets.py.
+
+    Unused_assets is imported and run in this interpreter, which avoids starting
+    a second Python process. Packaged executables (and trees where the import
+    fails) still launch it as a separate process.
+    """
+    if not getattr(sys, 'frozen', False):
+        try:
+            import Unused_assets
+        except ImportError as e:
+            print(f"Unable to import Unused_assets, starting it as a separate process: {e}")
+        else:
+            Unused_assets.main(staging_path)
+            return
+    unused_assets_path = os.path.join(get_current_directory(), "Unused_assets.py")
+    # sys.executable is the packaged program itself when frozen, so rely on PATH there
+    python = "python" if getattr(sys, 'frozen', False) else sys.executable
+    subprocess.Popen([python, unused_assets_path, staging_path])
 
 def browse_directory():
     """Opens a directory selection dialog."""
@@ -101,63 +372,88 @@ def start_process():
     if not repo_path:
         messagebox.showerror("Error", "Please select a directory.")
         return
-    staging_dir = os.path.basename(repo_path)
-    staging_path = f"{staging_base}/{staging_dir}"
+    if not staging_base:
+        messagebox.showerror("Error", "Please select a staging directory.")
+        return
+    # normpath drops a trailing slash, which would otherwise leave basename empty
+    staging_dir = os.path.basename(os.path.normpath(repo_path))
+    staging_path = os.path.join(staging_base, staging_dir)
+    if _is_within(staging_path, repo_path):
+        messagebox.showerror("Error", "The staging directory can't be the game repository or a folder inside it.")
+        return
 
     start_button.config(state=tk.DISABLED)
     progress_bar.config(mode="determinate", value=0)
     progress_label.config(text="Copying files...")
 
-    thread = Thread(target=copy_and_analyze, args=(repo_path, staging_path))
+    thread = Thread(target=copy_and_analyze, args=(repo_path, staging_path, incremental_var.get()))
     thread.start()
+    app.after(50, pump_ui_events)
+
+def pump_ui_events():
+    """Applies the UI updates queued by the copy thread, on the Tk main thread."""
+    global handoff_path
+    latest_progress = None
+    finished_path = None
+    failed = False
+    try:
+        while True:
+            kind, payload = ui_events.get_nowait()
+            if kind == 'progress':
+                latest_progress = payload  # Only the newest progress needs drawing
+            elif kind == 'done':
+                finished_path = payload
+            elif kind == 'failed':
+                failed = True
+    except queue.Empty:
+        pass
+    if latest_progress is not None:
+        progress, text = latest_progress
+        progress_bar.config(value=progress)
+        progress_label.config(text=text)
+    if failed:
+        progress_label.config(text="Copy failed.")
+        messagebox.showerror("Error", "The game couldn't be copied to the staging directory, so no assets were removed. See the console for details.")
+        start_button.config(state=tk.NORMAL)
+        return
+    if finished_path is None:
+        app.after(50, pump_ui_events)
+        return
+    progress_label.config(text="Done.")
+    # Unused_assets is started once this window has closed, see the end of this file
+    handoff_path = finished_path
+    messagebox.showinfo("Success", "Game copied to staging directory and unused assets removed.")
+    app.destroy()  # Close the GUI
 
-def copy_and_analyze(repo_path, staging_path):
+def copy_and_analyze(repo_path, staging_path, incremental=False):
     """Performs the copy and analysis with progress updates."""
     print (f'Source: {repo_path} -> {staging_path}')
-    skip_dirs = ['.git','.vs','DatabaseCleanUpTool','save']
-    file_count = 0
-    copied_files = 0
-    for root, _, files in os.walk(repo_path):
-        relative_path = os.path.relpath(root, repo_path)
-        if any(dir_to_skip in relative_path.split(os.sep) for dir_to_skip in skip_dirs):
-            continue
-        file_count += len(files)
-
-    def update_progress():
-        """Updates the progress bar."""
-        nonlocal copied_files
-        nonlocal file_count
-        copied_files += 1
-        progress = (copied_files / file_count) * 100
-        progress_bar.config(value=progress)
-        progress_label.config(text=f"Copying files... {copied_files}/{file_count}")
-        app.update_idletasks()
-
-    def get_current_directory():
-        """Gets the current directory of the running script."""
-        if getattr(sys, 'frozen', False):
-            # If the script is packaged into an executable, use this
-            return os.path.dirname(sys.executable)
-        else:
-            # If the script is running as a .py file, use this
-            return os.path.dirname(os.path.abspath(__file__))
 
+    last_ui_update = 0.0
+
+    def update_progress(copied_files, file_count, copied_bytes, total_bytes):
+        """Updates the progress bar by bytes copied, at most ~30 times a second."""
+        nonlocal last_ui_update
+        now = time.monotonic()
+        if now - last_ui_update < 0.033 and copied_files != file_count:
+            return
+        last_ui_update = now
+        # A few large audio/movie files dominate the copy time, so bytes track it better than file counts
+        progress = (copied_bytes / total_bytes) * 100 if total_bytes else 100
+        # This runs on the copy thread, so leave the widget updates to pump_ui_events
+        ui_events.put(('progress', (progress, f"Copying files... {copied_files}/{file_count}")))
+
+    if not copy_game_to_staging(repo_path, staging_path, SKIP_DIRS, update_progress, incremental):
+        # Don't hand a missing or partial staging folder over for deletion
+        ui_events.put(('failed', staging_path))
+        return
 
-
-        # Construct the full path to Unused_assets_Gem.py
-
-    copy_game_to_staging(repo_path, staging_path, skip_dirs, update_progress)
-
-    app.after(0, lambda: progress_label.config(text="Analyzing files..."))
-    app.after(0, lambda: progress_label.config(text="Done."))
     print(f'Passing {staging_path} to unused assets finder')
-    # Get the current directory of this program
-    current_directory = get_current_directory()
-    unused_assets_path = os.path.join(current_directory, "Unused_assets.py")
-    app.after(0, lambda: subprocess.Popen(["python", unused_assets_path, staging_path]))
-    app.after(0, lambda: messagebox.showinfo("Success", "Game copied to staging directory and unused assets removed."))
-    app.after(0, lambda: app.destroy())  # Close the GUI
+    ui_events.put(('done', staging_path))
     
+ui_events = queue.Queue()  # (kind, payload) updates from the copy thread, drained by pump_ui_events
+handoff_path = None  # Set by pump_ui_events once the staging copy is finished
+
 app = tk.Tk()
 app.title("Game Deployment Pipeline")
 
@@ -186,6 +482,10 @@ staging_entry.pack(side=tk.LEFT, padx=5)
 browse_staging_button = tk.Button(frame_staging, text="Browse", command=browse_staging_directory)
 browse_staging_button.pack(side=tk.LEFT)
 
+incremental_var = tk.BooleanVar(value=False)
+incremental_checkbox = tk.Checkbutton(app, text="Only copy changed files (keep existing staging folder)", variable=incremental_var)
+incremental_checkbox.pack(pady=5)
+
 progress_bar = ttk.Progressbar(app, orient="horizontal", length=400, mode="indeterminate")
 progress_bar.pack(pady=10)
 
@@ -195,4 +495,7 @@ progress_label.pack()
 start_button = tk.Button(app, text="Start", command=start_process)
 start_button.pack(pady=10)
 
-app.mainloop()
\ No newline at end of file
+app.mainloop()
+
+if handoff_path:
+    run_unused_assets(handoff_path)
@@ -6,8 +6,19 @@ import tkinter as tk
 import json
 import sys
 import re
+import marshal
+import hashlib
+import operator
+import functools
+import queue
+import mmap
 from tkinter import ttk, filedialog, messagebox
 from threading import Thread, main_thread
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import orjson  # Optional, parses the large Map/Animations JSON files several times faster
+except ImportError:
+    orjson = None
 from unittest.util import sorted_list_difference
 
 """
@@ -47,7 +58,28 @@ Notes:
 - Only tested with a Windows deployment. May not work with other operating systems.
 """
 
+# Animation IDs set in the Visustella Battle Core plugin parameters, as one pattern so plugins.js is scanned once
+ANIMATION_ID_RE = re.compile(r'(?:AttackAnimation|CastCertain|CastPhysical|CastMagical|ReflectAnimation):num.....(\d+)')
+# animationId values in the database JSON files, read from the raw text instead of a parsed tree
+DATA_ANIMATION_ID_RE = re.compile(rb'"animationId"\s*:\s*(-?\d+)')
+# tilesetId of a map, which only appears once, at the top level of the map JSON
+MAP_TILESET_ID_RE = re.compile(rb'"tilesetId"\s*:\s*(-?\d+)')
+# Quoted .js/.json paths in main.js
+SCRIPT_URL_RE = re.compile(rb'(?<=\'|")([^\'"]+\.(?:js|json))\"')
+
+# The .png extension in ASCII and UTF-16 in .efkefc files. Only these are searched for, and the
+# filename around each one is found from there, instead of a pattern tried at every byte position.
+EFKEFC_ASCII_PNG_RE = re.compile(rb'\.[pP][nN][gG]')
+EFKEFC_UTF16_PNG_RE = re.compile(rb'\.\x00[pP]\x00[nN]\x00[gG]\x00')
+
 cached_json = {}  # Cache for JSON files to avoid re-reading them
+cached_content = {}  # Cache for raw file contents (NULs stripped), shared with load_cached_json
+cached_json_stat = {}  # (st_mtime_ns, st_size) of each file in cached_json, used to validate the on-disk cache
+persisted_json = {}  # JSON parsed on earlier runs, keyed by path, as ((st_mtime_ns, st_size), data)
+persisted_scans = {}  # Code file scans of earlier runs, keyed by path, as ((st_mtime_ns, st_size), candidates key, references)
+scan_results = {}  # Code file scans of this run, in the same form, saved for the next run
+DISK_CACHE_DIR = 'rpgmz_unused'  # Under the user's cache directory, with one folder per project
+DISK_CACHE_VERSION = 1  # Bump whenever the reference matching rules change, so scans cached under the old rules are dropped
 app = tk.Tk()
 app.title("RPG Maker MZ Delete Unused Files")
 unused_files = []
@@ -57,6 +89,45 @@ used_files = set()
 code_files = set()
 animations = set()
 
+def iter_project_files(directory, skip_dirs=('DatabaseCleanUpTool',)):
+    """
+    Yields every directory of a project along with the names of its files.
+
+    This function walks the project with os.scandir, which tells files and
+    directories apart from the directory listing itself, and doesn't descend
+    into any directory named in skip_dirs or any hidden (dot) directory such
+    as .git. Directory paths use forward slashes. The walk keeps its own stack
+    instead of recursing, in the same top-down order. Like os.walk, a
+    directory that can't be listed is skipped instead of ending the walk.
+
+    Args:
+        directory: The directory to walk, using forward slashes.
+        skip_dirs: Names of directories to leave out entirely.
+
+    Yields:
+        A tuple of the directory path and a list of its file names.
+    """
+    stack = [directory]
+    while stack:
+        directory = stack.pop()
+        subfiles = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        # Like os.walk, don't follow symlinked directories
+                        if entry.name not in skip_dirs and not entry.name.startswith('.') and not entry.is_symlink():
+                            subdirs.append(f"{directory}/{entry.name}")
+                    else:
+                        subfiles.append(entry.name)
+        except OSError as e:
+            print(f"Error listing {directory}, its files are left out of the scan: {e}")
+            continue
+        yield directory, subfiles
+        # Reversed so the subdirectories are visited in listing order
+        stack.extend(reversed(subdirs))
+
 def get_used_plugins(directory):
     """
     Finds and returns a list of used plugins in an RPG Maker MZ project.
@@ -85,8 +156,8 @@ def get_used_plugins(directory):
             end_index = content.rindex(']') + 1  # Find the end of the JSON array
             json_string = content[start_index:end_index]
 
-            # Load the JSON string as a JSON object
-            plugins_data = json.loads(json_string)
+            # Load the JSON string as a JSON object (orjson's decode errors are json.JSONDecodeError too)
+            plugins_data = orjson.loads(json_string) if orjson is not None else json.loads(json_string)
 
             # Extract plugin names from the JSON data
             for plugin in plugins_data:
@@ -100,8 +171,9 @@ def get_used_plugins(directory):
     # --- Process main.js for core references ---
     main_file = os.path.join(directory, 'js', 'main.js').replace("\\", "/")
     main_content = get_content_from_file(main_file)
-    main_files = re.findall(r'(?<=\'|")([^\'"]+\.(?:js|json))\"',main_content)
+    main_files = SCRIPT_URL_RE.findall(main_content)
     for file in main_files:
+        file = file.decode('latin1')
         # We prepend 'js/' to the file name later to match the directory structure
         if file.startswith('js/'):
             file = file[3:]
@@ -126,24 +198,9 @@ def get_animation_ids(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-        animation_ids = set()
-
-        # Define the patterns for the animation IDs
-        patterns = [
-            re.compile(r'AttackAnimation:num.....(\d+)'),
-            re.compile(r'CastCertain:num.....(\d+)'),
-            re.compile(r'CastPhysical:num.....(\d+)'),
-            re.compile(r'CastMagical:num.....(\d+)'),
-            re.compile(r'ReflectAnimation:num.....(\d+)')
-        ]
-        
-        # Extract animation IDs using above regular expressions
-        for pattern in patterns:
-            matches = pattern.findall(content)
-            if matches:
-                for match in matches:
-                    animation_ids.add(int(match))
-        return animation_ids
+
+        # Extract animation IDs using the precompiled ANIMATION_ID_RE
+        return {int(match) for match in ANIMATION_ID_RE.findall(content)}
 
     except Exception as e:
         print(f"Error reading or parsing {file_path}: {e}")
@@ -154,107 +211,167 @@ def load_animations_json(directory):
     Loads animation data from Animations.json.
 
     This function reads the `Animations.json` and extracts relevant 
-    animation data, returning it as a list of tuples. Each tuple 
-    contains the animation's effect name and its corresponding ID.
+    animation data, returning a dictionary from each animation ID to
+    the effect names of the animations with that ID.
 
     Args:
         directory: The directory containing the `Animations.json` file.
 
     Returns:
-        A list of tuples, each containing an animation's effect name and ID.
+        A dictionary mapping animation IDs to lists of effect names.
     """
     animations_file = os.path.join(directory, "Animations.json").replace("\\", "/")
+    effects_by_id = {}
     if os.path.exists(animations_file):
         animations_data = load_cached_json(animations_file)
-        return [(item['effectName'], item['id']) for item in animations_data if item is not None]
-    return []
+        for item in animations_data:
+            if item is not None:
+                effects_by_id.setdefault(item['id'], []).append(item['effectName'])
+    return effects_by_id
 
-def extract_key_value(data, key):
+def reference_patterns(target_file):
     """
-    Recursively extracts values associated with a key from nested data.
+    Returns the strings that count as a reference to a file from JS/JSON code.
 
-    This function searches a nested dictionary or list for a specific key
-    and returns the corresponding value. It handles nested structures by
-    recursively searching through dictionaries and lists within the data.
+    A code file references the target file if any of these appears anywhere
+    in its content as a plain substring. The content is matched as raw bytes,
+    so a pattern that can't be encoded as Latin-1 never matches.
 
     Args:
-        data: The nested dictionary or list to search.
-        key: The key to search for.
+        target_file: The path to the target file.
 
     Returns:
-        The value associated with the key, or None if the key is not found.
-    """
-    if isinstance(data, dict):
-        for k, v in data.items():
-            if k == key:
-                return v
-            elif isinstance(v, (dict, list)):
-                result = extract_key_value(v, key)
-                if result is not None:
-                    return result
-    elif isinstance(data, list):
-        for item in data:
-            result = extract_key_value(item, key)
-            if result is not None:
-                return result
-    return None
-
-def search_content_for_file(content, source_file, target_file):
-    """
-    Checks if a file references another file.
-
-    This function searches the content of a source file for any references
-    to a target file. It handles different file types and search patterns
-    to accurately identify file references.
+        A tuple of the quoted name, the subdirectory form, the trailing
+        backslash form (all without the file extension) and the file name.
+    """
+    base_file = os.path.basename(target_file)
+    name_file = os.path.splitext(base_file)[0]
+    return (
+        f'\"{name_file}\"',  # Fully quoted, without file extension
+        f'/{name_file}',  # Subdir form, without file extension
+        f"{name_file}\\",  # Trailing Backslash, without file extension
+        base_file  # Exact match with file extension
+    )
+
+def _trie_to_regex(node):
+    """Converts a character trie (as nested dicts, '' marking a pattern end) into an equivalent regex."""
+    branches = [re.escape(char) + _trie_to_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A shorter pattern ends here, so the rest of this branch is optional
+        regex = f'(?:{regex})?'
+    return regex
+
+def build_reference_matcher(target_files):
+    """
+    Builds a function that finds which target files are referenced in a piece of content.
+
+    All reference patterns of all target files are merged into a single
+    trie-shaped regex, so each code file is scanned once in C instead of once
+    per (target file, pattern) pair. This is the same multi-pattern search an
+    Aho-Corasick automaton does, without needing a third-party package.
 
     Args:
-        content: The content of the source file.
-        source_file: The path to the source file.
-        target_file: The path to the target file.
+        target_files: The files to look for, typically the current unused files.
 
     Returns:
-        True if the source file references the target file, False otherwise.
+        A function taking the bytes content of a code file and returning the set of
+        target files it references, by the substring rules of
+        reference_patterns. Its max_pattern_length attribute is the length of the
+        longest pattern, for scanning a file in overlapping blocks, and its
+        min_pattern_length attribute is the length of the shortest one.
     """
-    if source_file.endswith(".efkefc"):
-        if target_file.endswith('.png'):
-            search_file = os.path.basename(target_file)
-            if search_file in content:
-                return True
-        else:
-            return False
-    else:
-        base_file = os.path.basename(target_file)
-        name_file = os.path.splitext(base_file)[0]
-        search_patterns = [
-            f'\"{name_file}\"',  # Fully quoted, without file extension
-            f'/{name_file}',  # Subdir form, without file extension
-            f"{name_file}\\",  # Trailing Backslash, without file extension
-            base_file  # Exact match with file extension
-        ]
-        for pattern in search_patterns:
-            if pattern in content:
-                return True
-        return False
+    targets_for = {}
+    for target_file in target_files:
+        for pattern in reference_patterns(target_file):
+            try:
+                # Code files are searched as raw bytes, where each byte stands for one Latin-1 character
+                pattern = pattern.encode('latin1')
+            except UnicodeEncodeError:
+                continue  # Can never appear in the content, as before when it was decoded as Latin-1
+            targets_for.setdefault(pattern, []).append(target_file)
+    if not targets_for:
+        find_nothing = lambda content: set()
+        find_nothing.max_pattern_length = 1
+        find_nothing.min_pattern_length = 1
+        return find_nothing
+
+    trie = {}
+    for pattern in targets_for:
+        node = trie
+        for char in pattern.decode('latin1'):
+            node = node.setdefault(char, {})
+        node[''] = {}
+    # The lookahead finds the longest pattern starting at every position, including overlapping ones
+    regex = re.compile(f'(?=({_trie_to_regex(trie)}))'.encode('latin1'))
+    pattern_lengths = sorted({len(pattern) for pattern in targets_for})
+
+    def find_referenced(content):
+        referenced = set()
+        for match in set(regex.findall(content)):
+            # Any shorter pattern starting at the same position is a prefix of the longest match
+            for length in pattern_lengths:
+                if length > len(match):
+                    break
+                for target_file in targets_for.get(match[:length], ()):
+                    referenced.add(target_file)
+        return referenced
+
+    # Callers scanning a file in blocks need to overlap them by one less than this
+    find_referenced.max_pattern_length = pattern_lengths[-1]
+    # A file smaller than this can't reference anything, so callers can skip reading it
+    find_referenced.min_pattern_length = pattern_lengths[0]
+    return find_referenced
 
 def get_content_from_file(file_path):
     """
-    Reads and decodes the content of a file.
+    Reads the content of a file for reference searching.
 
-    This function reads the raw data from a file in binary mode,
-    removes any null bytes, and then decodes the data using
-    Latin-1 encoding (with error handling) to ensure proper
-    text extraction.
+    This function reads the raw data from a file in binary mode and
+    removes any null bytes. The content is searched as bytes, which
+    matches byte for byte what a Latin-1 decode would, without the
+    decoded copy. The result is cached, and JSON files loaded
+    through load_cached_json are already in the cache.
 
     Args:
         file_path: The path to the file to read.
 
     Returns:
-        The decoded text content of the file.
+        The content of the file as bytes.
     """
+    if file_path not in cached_content:
+        with open(file_path, 'rb') as f:
+            raw_data = f.read()
+        cached_content[file_path] = raw_data.replace(b'\x00', b'')
+    return cached_content[file_path]
+
+def iter_content_blocks(file_path, overlap, block_size=65536):
+    """
+    Reads a file in blocks for reference searching, without keeping the whole file in memory.
+
+    Null bytes are removed the same way get_content_from_file does. Each block
+    starts with the last overlap bytes of the one before, so any pattern of up to
+    overlap + 1 bytes that crosses a block boundary is still whole in one block.
+
+    Args:
+        file_path: The path to the file to read.
+        overlap: The number of bytes carried over from each block into the next.
+        block_size: The number of bytes read at a time.
+
+    Yields:
+        The content of the file as overlapping blocks of bytes.
+    """
+    carry = b''
     with open(file_path, 'rb') as f:
-        raw_data = f.read()
-        text_content = raw_data.replace(b'\x00', b'').decode('latin1', errors='ignore')
-    return text_content
+        while True:
+            raw_data = f.read(block_size)
+            if not raw_data:
+                break
+            block = carry + raw_data.replace(b'\x00', b'')
+            yield block
+            carry = block[-overlap:] if overlap else b''
 
 def load_cached_json(file_path):
     """
@@ -262,7 +379,11 @@ def load_cached_json(file_path):
 
     This function loads a JSON file and stores it in a cache
     to avoid redundant file reads. If the file has already been
-    loaded, it retrieves the data from the cache.
+    loaded, it retrieves the data from the cache. If it was parsed
+    on an earlier run and its modification time and size haven't
+    changed, the data from the on-disk cache is used instead. The
+    bytes read are also used to fill the get_content_from_file
+    cache, so the later text search doesn't read the file a second time.
 
     Args:
         file_path: The path to the JSON file.
@@ -272,13 +393,184 @@ def load_cached_json(file_path):
     """
     if file_path not in cached_json:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                cached_json[file_path] = json.load(f)
+            file_stat = os.stat(file_path)
+            cached_json_stat[file_path] = (file_stat.st_mtime_ns, file_stat.st_size)
+            persisted = persisted_json.get(file_path)
+            if persisted is not None and persisted[0] == cached_json_stat[file_path]:
+                cached_json[file_path] = persisted[1]
+                return cached_json[file_path]
+            with open(file_path, 'rb') as f:
+                raw_data = f.read()
+            if file_path not in cached_content:
+                cached_content[file_path] = raw_data.replace(b'\x00', b'')
+            if orjson is not None:
+                cached_json[file_path] = orjson.loads(raw_data)
+            else:
+                cached_json[file_path] = json.loads(raw_data.decode('utf-8'))
         except Exception as e:
             print(f"Error loading {file_path}: {e}")
             cached_json[file_path] = None
     return cached_json[file_path]
 
+def get_map_tileset_id(file_path):
+    """
+    Finds the tileset ID of a map.
+
+    Maps are the largest JSON files in a project and only the tileset ID is
+    needed from them, so it is read from the text the reference search uses
+    anyway instead of parsing the whole map. If the key isn't found exactly
+    once, the map is parsed to be sure of the top-level value.
+
+    Args:
+        file_path: The path to the map JSON file.
+
+    Returns:
+        The tileset ID, or None if the map doesn't have one.
+    """
+    tileset_ids = MAP_TILESET_ID_RE.findall(get_content_from_file(file_path))
+    if len(tileset_ids) == 1:
+        return int(tileset_ids[0])
+    return load_cached_json(file_path).get('tilesetId')
+
+def disk_cache_file(directory):
+    """
+    Returns the path of the on-disk cache for a project.
+
+    The cache is kept in the user's own cache directory (%LOCALAPPDATA% on
+    Windows, $XDG_CACHE_HOME or ~/.cache elsewhere) rather than in the
+    project, so it never ends up in a deployed build or a shared repository.
+    Each project gets its own folder, named after a hash of its path.
+
+    Args:
+        directory: The root directory of the project.
+
+    Returns:
+        The path of the project's cache file, using forward slashes.
+    """
+    if os.name == 'nt':
+        cache_root = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        cache_root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    project_key = os.path.normcase(os.path.abspath(directory)).encode('utf-8', 'surrogatepass')
+    project_hash = hashlib.blake2b(project_key, digest_size=16).hexdigest()
+    return os.path.join(cache_root, DISK_CACHE_DIR, project_hash, 'cache.marshal').replace("\\", "/")
+
+def load_disk_cache(directory):
+    """
+    Loads the JSON parsed and the code files scanned on earlier runs from the project's cache file, if there is one.
+
+    The cache is written with marshal, which only stores plain values, so
+    reading it can't run any code. A cache written with another
+    DISK_CACHE_VERSION, or with an entry that doesn't have the expected
+    shape, is ignored as a whole.
+
+    Args:
+        directory: The root directory of the project.
+    """
+    cache_file = disk_cache_file(directory)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                cache = marshal.load(f)
+            if cache.get('version') != DISK_CACHE_VERSION:
+                return
+            json_entries = {}
+            for file_path, (stat_key, data) in cache['json'].items():
+                if not (isinstance(file_path, str) and isinstance(stat_key, tuple) and len(stat_key) == 2
+                        and all(isinstance(value, int) for value in stat_key)):
+                    raise ValueError(f"unexpected entry for {file_path}")
+                json_entries[file_path] = (stat_key, data)
+            scans = {}
+            for file_path, (stat_key, scan_key, referenced) in cache['scans'].items():
+                if not (isinstance(file_path, str) and isinstance(stat_key, tuple) and len(stat_key) == 2
+                        and all(isinstance(value, int) for value in stat_key) and isinstance(scan_key, bytes)
+                        and isinstance(referenced, frozenset) and all(isinstance(file, str) for file in referenced)):
+                    raise ValueError(f"unexpected entry for {file_path}")
+                scans[file_path] = (stat_key, scan_key, referenced)
+            persisted_json.update(json_entries)
+            persisted_scans.update(scans)
+        except Exception as e:
+            print(f"Error loading scan cache {cache_file}: {e}")
+
+def save_disk_cache(directory):
+    """
+    Writes every JSON file parsed and every code file scanned so far to the project's cache file for the next run.
+
+    The file is written next to the cache and then renamed over it, so an
+    interrupted save never leaves a truncated cache behind.
+
+    Args:
+        directory: The root directory of the project.
+    """
+    cache_file = disk_cache_file(directory)
+    json_entries = {file_path: (cached_json_stat[file_path], data)
+                    for file_path, data in cached_json.items()
+                    if data is not None and file_path in cached_json_stat}
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb') as f:
+            marshal.dump({'version': DISK_CACHE_VERSION, 'json': json_entries, 'scans': scan_results}, f)
+        os.replace(temp_file, cache_file)
+    except Exception as e:
+        print(f"Error saving scan cache {cache_file}: {e}")
+
+def clear_scan_caches():
+    """
+    Empties the in-memory caches of a scan.
+
+    Nothing in them is needed once the disk cache is saved, and a later scan
+    must not use file contents read before the files could have changed, so
+    they are emptied at the start and the end of every scan.
+    """
+    cached_json.clear()
+    cached_content.clear()
+    cached_json_stat.clear()
+    persisted_json.clear()
+    persisted_scans.clear()
+    scan_results.clear()
+
+def candidates_key(candidates):
+    """Returns a short digest identifying a set of candidate files, so a cached scan is only reused against the same set."""
+    digest = hashlib.blake2b(digest_size=16)
+    for candidate in sorted(candidates):
+        digest.update(candidate.encode('utf-8', 'surrogatepass') + b'\x00')
+    return digest.digest()
+
+def _png_runs(binary_data, extension_re, char_size):
+    """
+    Finds the printable runs in binary data that end in a .png extension.
+
+    A run is a string of printable ASCII characters, one byte each
+    (char_size 1), or UTF-16LE characters in that range, two bytes each
+    (char_size 2). These are the same strings the '[ -~]{4,}' and
+    '(?:[\\x20-\\x7E]\\x00){4,}' run scans found before filtering for .png.
+
+    Args:
+        binary_data: The bytes or mmap to search.
+        extension_re: The compiled pattern for the extension in this encoding.
+        char_size: The number of bytes per character.
+
+    Returns:
+        A list of the matching runs as bytes, in the order they appear.
+    """
+    def is_char(i):
+        # A printable character starts at i, with the zero high byte in UTF-16
+        return 32 <= binary_data[i] <= 126 and (char_size == 1 or binary_data[i + 1] == 0)
+
+    size = len(binary_data)
+    runs = []
+    for match in extension_re.finditer(binary_data):
+        start, end = match.span()
+        # Only an extension at the very end of its run is the end of a filename
+        if end + char_size <= size and is_char(end):
+            continue
+        # Walk back to the start of the run, which is only ever done once per run
+        while start >= char_size and is_char(start - char_size):
+            start -= char_size
+        runs.append(binary_data[start:end])
+    return runs
+
 def extract_png_filenames(efkefc_path):
     """
     Extracts PNG filenames from an efkefc file.
@@ -294,23 +586,44 @@ def extract_png_filenames(efkefc_path):
         A list of PNG filenames.
     """
     with open(efkefc_path, "rb") as f:
-        binary_data = f.read()
+        try:
+            # The search runs straight over the mapping, so the effect is never copied into a bytes object
+            binary_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            binary_data = f.read()  # Empty files can't be mapped
+        try:
+            # The binary is scanned once per encoding and only the matching names are decoded
+            ascii_pngs = [s.decode(errors="ignore") for s in _png_runs(binary_data, EFKEFC_ASCII_PNG_RE, 1)]
+            utf16_pngs = [s.decode("utf-16le", errors="ignore") for s in _png_runs(binary_data, EFKEFC_UTF16_PNG_RE, 2)]
+        finally:
+            if isinstance(binary_data, mmap.mmap):
+                binary_data.close()
 
-    # Extract potential filenames
-    ascii_text = re.findall(rb'[ -~]{4,}', binary_data)  # ASCII text
-    utf16_text = re.findall(rb'(?:[\x20-\x7E]\x00){4,}', binary_data)  # UTF-16 text
+    # dict.fromkeys removes duplicates and keeps the order they were found in
+    png_files = list(dict.fromkeys([*ascii_pngs, *utf16_pngs]))
+
+    return png_files
 
-    # Decode extracted text
-    ascii_strings = [s.decode(errors="ignore") for s in ascii_text]
-    utf16_strings = [s.decode("utf-16le", errors="ignore") for s in utf16_text]
+def make_output_log(output_text):
+    """
+    Makes a function that writes status lines to the output text box from the scan thread.
 
-    # Merge and filter for PNGs
-    potential_pngs = sorted(set(ascii_strings + utf16_strings))
-    png_files = [s for s in potential_pngs if s.lower().endswith(".png")]
+    Each line is inserted on the Tk thread as soon as it is logged, so the
+    phase headers show up while the scan is running. There are only a
+    handful of them, so one callback per line costs nothing.
 
-    return png_files
+    Args:
+        output_text: The text box to display the output.
 
-def find_unused_files(test_count, directory, output_text, progress_callback):
+    Returns:
+        The log function.
+    """
+    def log(message):
+        app.after(0, output_text.insert, tk.END, message)
+
+    return log
+
+def find_unused_files(test_count, directory, output_text, progress_callback, track_refs=True):
     """
     Finds unused files in an RPG Maker MZ project directory.
 
@@ -319,13 +632,14 @@ def find_unused_files(test_count, directory, output_text, progress_callback):
         directory: The root directory of the project.
         output_text: The text box to display the output.
         progress_callback: A function to update progress.
+        track_refs: Whether to build the file reference dictionaries, which are only needed for the report.
 
     Returns:
         A tuple containing:
-        - A list of unused files.
+        - A sorted tuple of unused files.
         - A set of used files.
-        - A dictionary of file references.
-        - A dictionary of files and where they are used.
+        - A dictionary of file references (empty unless track_refs is set).
+        - A dictionary of files and where they are used (empty unless track_refs is set).
     """
     global unused_files
     global used_files
@@ -334,130 +648,146 @@ def find_unused_files(test_count, directory, output_text, progress_callback):
     file_references = {}
     files_used_in = {}
 
-    animations_lookup = load_animations_json(os.path.join(directory, 'data'))
-    output_text.insert(tk.END, "Cataloguing Files\n")
+    log = make_output_log(output_text)
+
+    log("Cataloguing Files\n")
 
     # Build initial set of unused files, excluding the root directory,
-    # the 'DatabaseCleanUpTool' directory, and any files starting 
-    # with '.' (assumed to be generated by external tools).
-    # Also populate the file_references dictionary with root files.
-    for subdir, _, subfiles in os.walk(directory):
-        if 'DatabaseCleanUpTool' in subdir:
-            continue  # Don't include the DatabaseCleanUpTool directory
-        # Assumes any file starting with a '.' is generated by external tools for their own use, and are not part of the project
-        file_references['root'] = set()
-        for file in subfiles:
-            file_path = os.path.join(subdir, file).replace("\\", "/")
-            # Keep the root directory files; process js and json along with rest of the code files
-            if subdir == directory:
-                # We know that all of the files in the base directory are used, so we can skip them
-                used_files.add(file_path)
-                file_references['root'].add(file_path)
-                if file_path not in files_used_in:
-                    files_used_in[file_path] = set()
-                files_used_in[file_path].add('root')
-                continue
-            if not file.endswith("rmmzsave"):
-                unused_files.add(file_path)
+    # the 'DatabaseCleanUpTool' directory, and any save files.
+    # The js/json files in the data directory are collected in the same pass.
+    directory = os.path.normpath(directory).replace("\\", "/")
+    # Every path below is built from these, instead of an os.path.join and replace per file
+    data_directory = f"{directory}/data"
+    js_directory = f"{directory}/js"
+    effects_directory = f"{directory}/effects"
+    tilesets_directory = f"{directory}/img/tilesets"
+    se_directory = f"{directory}/audio/se"
+    animations_file = f"{data_directory}/Animations.json"
+    tilesets_file = f"{data_directory}/Tilesets.json"
+    clear_scan_caches()
+    load_disk_cache(directory)
+    animations_lookup = load_animations_json(data_directory)
+    root_files = set()
+    project_files = set()
+    data_code_files = set()
+    efkefc_files = set()
+    for subdir, subfiles in iter_project_files(directory):
+        # Interned, so the path sets and reference dictionaries all share one string per file
+        file_paths = [sys.intern(f"{subdir}/{file}") for file in subfiles]
+        # Keep the root directory files; process js and json along with rest of the code files
+        if subdir == directory:
+            root_files.update(file_paths)
+            continue
+        project_files.update(file_path for file_path in file_paths if not file_path.endswith("rmmzsave"))
+        efkefc_files.update(file_path for file_path in file_paths if file_path.endswith('.efkefc'))
+        if subdir == data_directory or subdir.startswith(data_directory + "/"):
+            data_code_files.update(file_path for file_path in file_paths if file_path.endswith(('.js', '.json')))
+
+    # We know that all of the files in the base directory are used, so we can skip them
+    used_files.update(root_files)
+    if track_refs:
+        file_references['root'] = root_files
+        for file_path in root_files:
+            files_used_in.setdefault(file_path, set()).add('root')
+    unused_files.update(project_files)
     total_files = len(unused_files)
 
     # --- Process plugins.js for used plugins ---
-    output_text.insert(tk.END, "Processing plugins.js for used plugins\n")
+    log("Processing plugins.js for used plugins\n")
     used_plugins = get_used_plugins(directory)
     # Add the plugin .js files to used_files and code_files
     for plugin_name in used_plugins:
-        plugin_file = os.path.join(directory, 'js', plugin_name).replace("\\", "/")
+        plugin_file = sys.intern(f"{js_directory}/{plugin_name}".replace("\\", "/"))
         code_files.add(plugin_file)
         used_files.add(plugin_file)
-        if plugin_file not in file_references:
-            file_references[plugin_file] = set()
-        file_references[plugin_file].add('.')
-        if plugin_file in unused_files:
-            unused_files.remove(plugin_file)
-        if plugin_file not in files_used_in:
-            files_used_in[plugin_file] = set()
-        files_used_in[plugin_file].add('.')
+        unused_files.discard(plugin_file)
+        if track_refs:
+            file_references.setdefault(plugin_file, set()).add('.')
+            files_used_in.setdefault(plugin_file, set()).add('.')
     progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
 
-    # --- Find all js/json in data directory ---
-    for subdir, _, subfiles in os.walk(os.path.join(directory, 'data')):
-        for file in subfiles:
-            if file.endswith('.js') or file.endswith('.json'):
-                file_path = os.path.join(subdir, file).replace("\\", "/")
-                code_files.add(file_path)
-                used_files.add(file_path)
-                if file_path not in file_references:
-                    file_references[file_path] = set()
-                file_references[file_path].add('.')
-                if file_path in unused_files:
-                    unused_files.remove(file_path)
-                if file_path not in files_used_in:
-                    files_used_in[file_path] = set()
-                files_used_in[file_path].add('.')
-                if file_path in unused_files:
-                    unused_files.remove(file_path)
-        
-    output_text.insert(tk.END, f"Searching {len(code_files)} core files with {total_files} potential references\n")
+    # --- Add all js/json in data directory ---
+    code_files.update(data_code_files)
+    used_files.update(data_code_files)
+    unused_files.difference_update(data_code_files)
+    if track_refs:
+        for file_path in data_code_files:
+            file_references.setdefault(file_path, set()).add('.')
+            files_used_in.setdefault(file_path, set()).add('.')
+
+    log(f"Searching {len(code_files)} core files with {total_files} potential references\n")
     # --- Process main.js for effekseerWasmUrl plugin ---
     # if we have the effekseerWasmUrl plugin, we need to add it to the used files
-    main_file = os.path.join(directory, 'js', 'main.js').replace("\\", "/")
+    main_file = f"{js_directory}/main.js"
     main_content = get_content_from_file(main_file)
     # If the 'effekseerWasmUrl' plugin is present in main.js,
     # add it to the used_files set and update tracking dictionaries.
-    if ('effekseerWasmUrl' in main_content):
+    if (b'effekseerWasmUrl' in main_content):
         used_files.add('effekseerWasmUrl')
         if 'effekseerWasmUrl' in unused_files:
             unused_files.remove('effekseerWasmUrl')
-            if 'effekseerWasmUrl' not in files_used_in:
-                files_used_in['effekseerWasmUrl'] = set()
-            files_used_in['effekseerWasmUrl'].add(main_file)
+            if track_refs:
+                files_used_in.setdefault('effekseerWasmUrl', set()).add(main_file)
+
+    # Every JSON file is read here first, so overlap those reads across threads up front.
+    # get_content_from_file caches what it reads, which the loops below then pick up.
+    def prefetch_content(filepath):
+        try:
+            get_content_from_file(filepath)
+        except OSError:
+            pass  # Reported by the loop below, which tries the file again
+
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        executor.map(prefetch_content, [filepath for filepath in code_files if filepath.endswith('.json')])
 
     # Iterate through JSON files to find animation IDs and add them
     # to the `animations` set for later processing.
-    output_text.insert(tk.END, "Processing JSON files for used animations\n")
+    log("Processing JSON files for used animations\n")
     for i, filepath in enumerate(code_files):
         try:
             if filepath.endswith('.json'):
-                json_content = load_cached_json(filepath)
-                for item in json_content:
-                    animation_id = extract_key_value(item, 'animationId')
-                    if animation_id:
-                        if animation_id == -1: #Normal Attack
-                            continue
-                        animations.add(animation_id)
+                # The ids are picked straight out of the text, so no file is parsed just for this.
+                # The bytes are cached for the reference search below, so this doesn't add a read.
+                for match in DATA_ANIMATION_ID_RE.finditer(get_content_from_file(filepath)):
+                    animation_id = int(match.group(1))
+                    if animation_id == -1 or animation_id == 0: #Normal Attack, or None
+                        continue
+                    animations.add(animation_id)
         except Exception as e:
             print(f"Error reading {filepath} while processing JSON files for used animations: {e}")
     progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
 
     # --- Load plugins.js, get referenced animation files ---
-    output_text.insert(tk.END, "Getting animations from plugins.js\n")
-    plugins_file = os.path.join(directory, "js", "plugins.js").replace("\\", "/")
+    log("Getting animations from plugins.js\n")
+    plugins_file = f"{js_directory}/plugins.js"
     if os.path.exists(plugins_file):
         animation_ids_from_plugins = get_animation_ids(plugins_file)
         animations.update(animation_ids_from_plugins)  # Add the extracted IDs to the animations list
 
     # --- Process Maps to identify used tilsets -> tileset images
-    output_text.insert(tk.END, "Processing Maps for required Tilesets\n")
+    log("Processing Maps for required Tilesets\n")
     used_tilesets = set()
+    tileset_by_id = None
     for i, filepath in enumerate(code_files):
-        file_references[filepath] = set()
+        if track_refs:
+            file_references[filepath] = set()
         try:
             if filepath.endswith('.json') and 'Map' in filepath and 'MapInfo' not in filepath:
-                map_data = load_cached_json(filepath)
-                tileset_id = map_data.get('tilesetId')
+                tileset_id = get_map_tileset_id(filepath)
                 if tileset_id is not None:
-                    # Load tilesets.json
-                    tilesets_data = load_cached_json(os.path.join(directory, 'data', 'Tilesets.json'))
+                    # Load tilesets.json once, on the first map that needs it, and index it by ID
+                    if tileset_by_id is None:
+                        tilesets_data = load_cached_json(tilesets_file) or []
+                        tileset_by_id = {ts['id']: ts for ts in tilesets_data if isinstance(ts, dict) and 'id' in ts}
                     # Find the tileset with the matching ID
-                    tileset = next(
-                        (ts for ts in tilesets_data
-                            if isinstance(ts, dict) and ts.get('id') == tileset_id),
-                        None)
+                    tileset = tileset_by_id.get(tileset_id)
                     if tileset:
                         # Add all tileset names from the 'tilesetNames' list
                         used_tilesets.update(tileset.get('tilesetNames', []))
                         # This is a set, so need to add the list as a tuple to avoid unhashable type error
-                        file_references[filepath].add(tuple(tileset.get('tilesetNames',[])))
+                        if track_refs:
+                            file_references[filepath].add(tuple(tileset.get('tilesetNames',[])))
                     else:
                         print(
                             f"Warning: No tileset found with ID {tileset_id} for map {filepath}"
@@ -468,146 +798,218 @@ def find_unused_files(test_count, directory, output_text, progress_callback):
 
     # --- Add used tileset PNG files to used_files ---
     for tileset_name in used_tilesets:
-        tileset_png = os.path.join(directory, 'img', 'tilesets', tileset_name + '.png').replace("\\", "/")
+        tileset_png = sys.intern(f"{tilesets_directory}/{tileset_name}.png".replace("\\", "/"))
         used_files.add(tileset_png)
-        if tileset_png in unused_files:
-            unused_files.remove(tileset_png)
+        unused_files.discard(tileset_png)
         if tileset_name == '':
             print(f"Warning: Tileset name is empty")
         else:
-            if tileset_png not in files_used_in:
-                files_used_in[tileset_png] = set()
-            files_used_in[tileset_png].add(filepath)
+            if track_refs:
+                files_used_in.setdefault(tileset_png, set()).add(filepath)
     progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
 
     # --- Process JS/JSON files for the remainder of dependencies ---
-    output_text.insert(tk.END, "Reviewing JS/JSON Files\n")
-    outputCount = 0
-    for i, filepath in enumerate(code_files.copy()):
+    log("Reviewing JS/JSON Files\n")
+    # All candidate files are matched in a single pass over each code file, instead of
+    # a separate substring search for every (code file, candidate file) pair.
+    candidates = list(unused_files)
+    reference_matcher = build_reference_matcher(candidates)
+    scan_key = candidates_key(candidates)
+
+    def scan_code_file(filepath):
+        """Reads one code file and returns the candidate files it references."""
         try:
-            content = get_content_from_file(filepath)
-            for i, file in enumerate(unused_files.copy()):
-                if search_content_for_file(content, filepath, file):
-                    if 'GroupB_00' in file:
-                        print(f"Found {file} in {filepath}")
-                    used_files.add(file)
-                    file_references[filepath].add(file)
-                    if file not in files_used_in:
-                        files_used_in[file] = set()
-                    files_used_in[file].add(filepath)
-                    if file in unused_files:
-                        outputCount += 1
-                        unused_files.remove(file)
-                    # we need to explicitly add the .info files for locale .pak files, as they don't contain any references to the .info files
-                    if file.endswith('.pak'):
-                        info_file = file + '.info'
-                        used_files.add(info_file)
-                        file_references[filepath].add(info_file)
-                        if info_file not in files_used_in:
-                            files_used_in[info_file] = set()
-                        files_used_in[info_file].add(filepath)
-                        if info_file in unused_files:
-                            unused_files.remove(info_file)
-            # print(f"----------------------- Processed {filepath} with {outputCount} new references ----------------------")
-            outputCount = 0
-
+            file_stat = os.stat(filepath)
+            stat_key = (file_stat.st_mtime_ns, file_stat.st_size)
+            # Reuse an earlier run's result if neither the file nor the candidate files changed since
+            persisted = persisted_scans.get(filepath)
+            if persisted is not None and persisted[0] == stat_key and persisted[1] == scan_key:
+                referenced = set(persisted[2])
+            elif file_stat.st_size < reference_matcher.min_pattern_length:
+                # Too small to hold even the shortest pattern (removing null bytes only makes it smaller)
+                referenced = set()
+            elif filepath in cached_content:
+                referenced = reference_matcher(cached_content[filepath])
+            else:
+                # Plugin scripts aren't needed again after this, so stream them instead of caching them whole
+                referenced = set()
+                for block in iter_content_blocks(filepath, reference_matcher.max_pattern_length - 1):
+                    referenced |= reference_matcher(block)
+            scan_results[filepath] = (stat_key, scan_key, frozenset(referenced))
+            return referenced
         except Exception as e:
             print(f"Error reading {filepath} while processing js/json files: {e}")
-        test_count += 1
-        progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
+            return set()
+
+    # Reading the files is I/O bound, so overlap it across threads. The results are merged
+    # here on this thread, so the shared sets and dictionaries are only changed in one place.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        scanned_code_files = list(code_files)
+        for filepath, referenced in zip(scanned_code_files, executor.map(scan_code_file, scanned_code_files)):
+            for file in referenced:
+                if 'GroupB_00' in file:
+                    print(f"Found {file} in {filepath}")
+                used_files.add(file)
+                if track_refs:
+                    file_references[filepath].add(file)
+                    files_used_in.setdefault(file, set()).add(filepath)
+                unused_files.discard(file)
+                # we need to explicitly add the .info files for locale .pak files, as they don't contain any references to the .info files
+                if file.endswith('.pak'):
+                    info_file = sys.intern(file + '.info')
+                    used_files.add(info_file)
+                    if track_refs:
+                        file_references[filepath].add(info_file)
+                        files_used_in.setdefault(info_file, set()).add(filepath)
+                    unused_files.discard(info_file)
+            test_count += 1
+            progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
+    # The code file contents are only searched above, so don't hold them through the effect checks
+    cached_content.clear()
 
     # Process animations to identify used.efkefc files and any
     # embedded sound effects (.ogg files).
-    output_text.insert(tk.END, "Checking for Used Animations\n")
-    file_references['animations'] = set()
+    log("Checking for Used Animations\n")
+    if track_refs:
+        file_references['animations'] = set()
+    # 1. Load the animation JSON file
+    animations_data = load_cached_json(animations_file) or []
+    animation_by_id = {item['id']: item for item in animations_data if item}
     for i, animation_id in enumerate(animations):
         #try:
-            # 1. Load the animation JSON file
-            animations_data = load_cached_json(os.path.join(directory, 'data', 'Animations.json'))
-
             # 2. Find the animation data
-            animation_data = next(
-                (item for item in animations_data if item and item['id'] == animation_id),
-                None)
+            animation_data = animation_by_id.get(animation_id)
             if animation_data is None:  # Skip if animation not found
                 print(f"Warning: Animation with ID {animation_id} not found.")
                 continue
             # 3. Mark efkefc files as used
-            for effect_name, effect_id in animations_lookup:
-                if effect_id == animation_id:
-                    effect_file = os.path.join(directory, 'effects', f"{effect_name}.efkefc").replace("\\", "/")
-                    used_files.add(effect_file)
+            for effect_name in animations_lookup.get(animation_id, ()):
+                effect_file = sys.intern(f"{effects_directory}/{effect_name}.efkefc".replace("\\", "/"))
+                used_files.add(effect_file)
+                if track_refs:
                     file_references['animations'].add(effect_file)
-                    if effect_file not in files_used_in:
-                        files_used_in[file_path] = set()
-                    files_used_in[file_path].add(os.path.join(directory, 'data', 'Animations.json').replace("\\", "/"))
-                    if effect_file in unused_files:
-                        unused_files.remove(effect_file)
-                    # 4. Extract sound file names
-                    sound_files = set()
-                    for timing in animation_data.get('soundTimings', []):
-                        if isinstance(timing, dict):  # Check if timing is a dictionary
-                            se_data = timing['se']
-                            se = se_data['name']
-                            sound_files.add(se)
+                    files_used_in.setdefault(effect_file, set()).add(animations_file)
+                unused_files.discard(effect_file)
+                # 4. Extract sound file names
+                sound_files = set()
+                for timing in animation_data.get('soundTimings', []):
+                    if isinstance(timing, dict):  # Check if timing is a dictionary
+                        se_data = timing['se']
+                        se = se_data['name']
+                        sound_files.add(se)
+                        if track_refs:
                             file_references['animations'].add(se)
-                            if se not in files_used_in:
-                                files_used_in[se] = set()
-                            files_used_in[se].add(os.path.join(directory, 'data', 'Animations.json'))
-                        elif isinstance(se,str):
-                            sound_files.add(se)
-                        elif isinstance(timing, list):  # If timing is a list, iterate over it
-                            for subtiming in timing:
-                                if isinstance(subtiming, dict):
-                                    if isinstance(timing.get('se'), dict):  # Check if 'se' is a dictionary within 'timing'
-                                        for key, value in timing['se'].items():
-                                            if key == 'name':
-                                                sound_files.add(value)
+                            files_used_in.setdefault(se, set()).add(animations_file)
+                    elif isinstance(se,str):
+                        sound_files.add(se)
+                    elif isinstance(timing, list):  # If timing is a list, iterate over it
+                        for subtiming in timing:
+                            if isinstance(subtiming, dict):
+                                if isinstance(timing.get('se'), dict):  # Check if 'se' is a dictionary within 'timing'
+                                    for key, value in timing['se'].items():
+                                        if key == 'name':
+                                            sound_files.add(value)
+                                            if track_refs:
                                                 file_references['animations'].add(value)
-                                    else:
-                                        print(f'se is not a dict: {se}')  # Debug print for non-dictionary se
-                        else:
-                            print('Timing data is something else')
-                    # 5. Add sound files to used_files
-                    for sound_file in sound_files:
-                        audio_file = os.path.join(directory, 'audio', 'se', sound_file + '.ogg').replace("\\", "/")
-                        used_files.add(audio_file)
+                                else:
+                                    print(f'se is not a dict: {se}')  # Debug print for non-dictionary se
+                    else:
+                        print('Timing data is something else')
+                # 5. Add sound files to used_files
+                for sound_file in sound_files:
+                    audio_file = sys.intern(f"{se_directory}/{sound_file}.ogg".replace("\\", "/"))
+                    used_files.add(audio_file)
+                    if track_refs:
                         file_references['animations'].add(audio_file)
-                        if audio_file not in files_used_in:
-                            files_used_in[audio_file] = set()
-                        files_used_in[audio_file].add(os.path.join(directory, 'data', 'Animations.json'))
-                        if audio_file in unused_files:
-                            unused_files.remove(audio_file)
-                    break  # Exit the animations_lookup after finding a match
+                        files_used_in.setdefault(audio_file, set()).add(animations_file)
+                    unused_files.discard(audio_file)
         #except Exception as e:
          #   print(f"Error processing animation {animation_id}: {e}")
     progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
 
     # --- Now that we have our used efkefc from the animations and we've identified every other used file, process them looking for used images ---
-    output_text.insert(tk.END, "Checking for Used Effects and Images\n")
+    log("Checking for Used Effects and Images\n")
 
-    for i, effect_file in enumerate(used_files.copy()):  # Iterate over a copy to avoid modification issues
-        if effect_file.endswith('.efkefc'):
-            try:
-                file_references['effect_file'] = set()
-                # Parse the .efkefc file to find any referenced .png files
-                png_files = extract_png_filenames(effect_file)
-                for png_file in png_files:
-                    full_path = os.path.join(directory, 'effects', png_file).replace("\\", "/")
-                    if full_path in unused_files:
-                        used_files.add(full_path)
+    # The effect files were catalogued by the walk, so only the used ones need picking out here
+    effect_files = sorted(efkefc_files & used_files)
+
+    def read_effect_pngs(effect_file):
+        """Parses one .efkefc file for the .png files it references."""
+        try:
+            return extract_png_filenames(effect_file)
+        except Exception as e:
+            print(f"Error reading {effect_file} while checking for used effects and images: {e}")
+            return []
+
+    if track_refs:
+        file_references['effect_file'] = set()
+    # Reading the effects overlaps across threads; the results are merged here in effect_files order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for effect_file, png_files in zip(effect_files, executor.map(read_effect_pngs, effect_files)):
+            for png_file in png_files:
+                full_path = sys.intern(f"{effects_directory}/{png_file}".replace("\\", "/"))
+                if full_path in unused_files:
+                    used_files.add(full_path)
+                    if track_refs:
                         file_references['effect_file'].add(png_file)
-                        if png_file not in files_used_in:
-                            files_used_in[png_file] = set()
-                        files_used_in[png_file].add(os.path.join(effect_file))
-                        if file in unused_files:
-                            unused_files.remove(full_path)
-            except Exception as e:
-                print(f"Error reading {effect_file} while checking for used effects and images: {e}")
+                        files_used_in.setdefault(png_file, set()).add(effect_file)
+                    unused_files.remove(full_path)
     progress_callback(test_count, len(code_files),len(used_files), len(unused_files))
-    output_text.insert(tk.END, f'{len(unused_files)} unused files remain')
+    log(f'{len(unused_files)} unused files remain')
+    save_disk_cache(directory)
+    clear_scan_caches()
+
+    return tuple(sorted(unused_files)), used_files, file_references, files_used_in
+
+@functools.lru_cache(maxsize=None)
+def _fmt_tileset(tileset):
+    """Formats a tileset tuple for the references report, once per unique tuple."""
+    return f"Tilesets: {tileset}"
+
+def _split_and_format(used_files):
+    """
+    Sorts a set of used files for the references report.
+
+    Strings and tuples can't be sorted together, so they are partitioned in one
+    pass and sorted separately. The tuples follow the strings, with a "Tilesets: " prefix.
+
+    Args:
+        used_files: The file paths (and tileset tuples) to format.
+
+    Returns:
+        A list of the sorted lines.
+    """
+    strings = []
+    tuples = []
+    # The entries are plain str and tuple objects built by the scan, never subclasses,
+    # so an exact type check is enough and skips isinstance's subclass handling
+    for used_file in used_files:
+        used_type = type(used_file)
+        if used_type is str:
+            strings.append(used_file)
+        elif used_type is tuple:
+            tuples.append(used_file)
+    strings.sort()
+    tuples.sort()
+    strings.extend(map(_fmt_tileset, tuples))
+    return strings
+
+def _render_references(items, heading):
+    """
+    Formats the used file references section of the report.
 
-    return list(sorted(unused_files)), used_files, file_references, files_used_in
+    Args:
+        items: (source, used files) pairs, in the order to show them.
+        heading: The format string for each source's heading line.
+
+    Returns:
+        The section text.
+    """
+    output_parts = []
+    for source_file, used_files in items:
+        output_parts.append(heading.format(source_file))
+        output_parts.extend(f"  - {used_file}\n" for used_file in _split_and_format(used_files))
+    return ''.join(output_parts)
 
 def main(staging_path):
     # --- GUI Event Handler Functions ---
@@ -624,6 +1026,7 @@ def main(staging_path):
         global used_files
         global code_files
         global animations
+        nonlocal scan_running
         progress['value'] = 0
         delete_progress['value'] = 0
         unused_files = []
@@ -635,88 +1038,193 @@ def main(staging_path):
         output_text.delete(1.0, tk.END)
         staging_path = selected_directory.get()
         print(f'Running unused file finder on {staging_path}')
+        scan_running = True
+        scan_progress.clear()
         thread = Thread(target=find_and_display_unused_files, args=(staging_path,))
         thread.start()
+        app.after(50, pump_scan_progress)
 
+    marked_files = ()  # The unused files from the last scan, as shown under Marked For Deletion
+    delete_events = queue.Queue()  # (kind, payload) updates from the deletion thread, drained by pump_delete_events
+    scan_progress = {}  # The newest counts from the scan thread, under 'counts', drawn by pump_scan_progress
+    scan_running = False
     def update_progress(test_count, code_count, used_count, unused_count):
+        # This runs on the scan thread, so only record the newest counts; pump_scan_progress draws them
+        scan_progress['counts'] = (test_count, code_count, used_count, unused_count)
+
+    def draw_scan_progress():
+        counts = scan_progress.pop('counts', None)
+        if counts is None:
+            return
+        test_count, code_count, used_count, unused_count = counts
         # Calculate the percentage and update the progress bar
-        percentage = (test_count / code_count) * 100
-        app.after(0, lambda: progress.config(value=percentage))
-        app.after(0, lambda: status_label.config(
+        progress.config(value=(test_count / code_count) * 100)
+        status_label.config(
             text=f"Files Evaluated: {test_count}/{code_count}, "
                  f"Unused/Used Files: {unused_count}/{used_count+code_count}"
-        ))
+        )
+
+    def pump_scan_progress():
+        """Draws the newest scan progress every 50 ms on the Tk main thread, however often the scan reports it."""
+        if not scan_running:
+            return
+        draw_scan_progress()
+        app.after(50, pump_scan_progress)
+
+    def insert_bulk(*blocks):
+        """Inserts large blocks into output_text with the scrollbar detached, so it is updated once afterwards."""
+        yscrollcommand = output_text.cget('yscrollcommand')
+        output_text.config(yscrollcommand='')
+        try:
+            # Tk's insert takes any number of (text, tags) pairs, so the blocks go in with one
+            # call and without first being joined into another full-size copy here
+            tagged = []
+            for block in blocks[1:]:
+                tagged += ((), block)
+            output_text.insert(tk.END, blocks[0], *tagged)
+        finally:
+            output_text.config(yscrollcommand=yscrollcommand)
+        # Only once the text is in, put the insert cursor back at the start of the text
+        output_text.mark_set(tk.INSERT, '1.0')
 
     def find_and_display_unused_files(directory):
         print(f'Finding unused files in {directory}')
-        test_count = 0
-        unused_files, used_files, references, where_used = find_unused_files(test_count, directory, output_text, update_progress)
-        if show_references_var.get():
-            output_text.insert(tk.END, "\n\n--------------Used File References--------------\n")
-            if show_by_filename_var.get():
-                output_str = ""
-                sorted_list_difference = sorted(where_used.items())
-                #sorted_list_difference = where_used.items()
-                for source_file, used_files in sorted_list_difference:
-                    output_str += f"File: {source_file} Used In:\n"
-                    # Sort used_files, handling tuples and strings separately
-                    sorted_used_files = sorted([f for f in used_files if isinstance(f, str)])  # Sort strings
-                    sorted_tuples = sorted([f for f in used_files if isinstance(f, tuple)])  # Sort tuples
-
-                    # Add "Tilesets: " prefix to each tuple
-                    sorted_used_files += [f"Tilesets: {t}" for t in sorted_tuples]
-                    #output_str += f"  - {sorted_used_files}\n"
-                    for used_file in sorted_used_files:
-                        output_str += f"  - {used_file}\n"
-                output_text.insert(tk.END, output_str)
-            else:
-                output_str = ""
-                for source_file, used_files in sorted(references.items(), key=lambda item: item):
-                    output_str += f"Files Used In: {source_file}\n"
-                    # Sort used_files, handling tuples and strings separately
-                    sorted_used_files = sorted([f for f in used_files if isinstance(f, str)])  # Sort strings
-                    sorted_tuples = sorted([f for f in used_files if isinstance(f, tuple)])  # Sort tuples
-                    # Add "Tilesets: " prefix to each tuple
-                    sorted_used_files += [f"Tilesets: {t}" for t in sorted_tuples]
-
-                    #output_str += f"  - {sorted_used_files}\n"
-                    for used_file in sorted_used_files:
-                        output_str += f"  - {used_file}\n"
-                output_text.insert(tk.END, output_str)
-        output_text.insert(tk.END, "\n\n--------------Unused Files, Marked For Deletion--------------\n")
-        output_text.insert(tk.END, '\n'.join(unused_files))
-        progress['value'] = 100
-        if unused_files:
-            delete_button.pack(pady=5)
+
+        def scan_finished():
+            nonlocal scan_running
+            scan_running = False
+
+        try:
+            test_count = 0
+            # The references are only built when they will be shown
+            unused_files, used_files, references, where_used = find_unused_files(
+                test_count, directory, output_text, update_progress, track_refs=show_references_var.get())
+            # The whole report goes into the text box with one insert, instead of one per section
+            output_blocks = []
+            if show_references_var.get():
+                output_blocks.append("\n\n--------------Used File References--------------\n")
+                if show_by_filename_var.get():
+                    report, heading = where_used, "File: {} Used In:\n"
+                else:
+                    report, heading = references, "Files Used In: {}\n"
+                output_blocks.append(_render_references(sorted(report.items(), key=operator.itemgetter(0)), heading))
+            output_blocks.append("\n\n--------------Unused Files, Marked For Deletion--------------\n")
+            output_blocks.append('\n'.join(unused_files))
+
+            def show_results():
+                nonlocal marked_files, scan_running
+                marked_files = unused_files
+                scan_running = False
+                draw_scan_progress()  # The final counts
+                insert_bulk(*output_blocks)
+                progress['value'] = 100
+                if unused_files:
+                    delete_button.pack(pady=5)
+            # Queued behind the scan's status lines, so the report is always inserted after them
+            app.after(0, show_results)
+        finally:
+            # Also queued when the scan raised, so the progress pump always stops
+            app.after(0, scan_finished)
 
     def prompt_delete():
         result = messagebox.askyesno("Delete Files", "Do you want to delete the unused files?")
         if result:
-            print(f'Deleting {len(unused_files)} unused files')
-            thread = Thread(target=delete_unused_files, args=[unused_files])
+            # The sorted tuple from the scan is shown in the report and never changes, so the
+            # deletion thread can share it without a copy
+            files = marked_files
+            print(f'Deleting {len(files)} unused files')
+            thread = Thread(target=delete_unused_files, args=[files])
             thread.start()
+            app.after(50, pump_delete_events, files)
+
+    def remove_directory_files(directory, names):
+        """
+        Deletes files from one directory, returning the paths that were removed.
+
+        The directory is opened once and each file is unlinked relative to it, so the
+        kernel doesn't resolve the full path again for every file. Where dir_fd isn't
+        supported (Windows), the full path is removed instead. A failure is logged and
+        doesn't stop the other files.
+        """
+        removed = []
+        dir_fd = None
+        if os.unlink in os.supports_dir_fd:
+            try:
+                dir_fd = os.open(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+            except OSError:
+                dir_fd = None
+        try:
+            for name in names:
+                file = f"{directory}/{name}"
+                if 'GroupB_00' in file:
+                    print(f"Deleting {file}")
+                try:
+                    if dir_fd is None:
+                        os.remove(file)
+                    else:
+                        os.unlink(name, dir_fd=dir_fd)
+                    removed.append(file)
+                except Exception as e:
+                    print(f"Error deleting {file}: {e}")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        return removed
 
     def delete_unused_files(files):
-        for i, file in enumerate(files):
-            if 'GroupB_00' in file:
-                print(f"Deleting {file}")
-            try:
-                os.remove(file)
-                output_text.insert(tk.END,file)
-                app.after(100, update_delete_progress, i + 1, files, used_files)
-            except Exception as e:
-                print(f"Error deleting {file}: {e}")
-        app.after(100, deletion_complete)
-
-    def update_delete_progress(count, files, used_files):
-        delete_progress['value'] = (count / (len(files)+len(used_files))) * 100
+        deleted_log = []
+        names_by_directory = {}
+        for file in files:
+            directory, name = os.path.split(file)
+            names_by_directory.setdefault(directory, []).append(name)
+        # Deleting is bound by file system metadata updates, so overlap the batches across threads.
+        # Large directories are split into several batches so they don't end up on a single thread.
+        batch_size = 64
+        batch_directories = []
+        batch_names = []
+        for directory, names in names_by_directory.items():
+            for start in range(0, len(names), batch_size):
+                batch_directories.append(directory)
+                batch_names.append(names[start:start + batch_size])
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        count = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for names, removed in zip(batch_names, executor.map(remove_directory_files, batch_directories, batch_names)):
+                deleted_log.extend(removed)
+                count += len(names)
+                # This runs on the deletion thread, so leave the widget updates to pump_delete_events
+                delete_events.put(('progress', count))
+        delete_events.put(('done', deleted_log))
+
+    def pump_delete_events(files):
+        """Applies the updates queued by the deletion thread, on the Tk main thread."""
+        latest_count = None
+        deleted_log = None
+        try:
+            while True:
+                kind, payload = delete_events.get_nowait()
+                if kind == 'progress':
+                    latest_count = payload  # Only the newest count needs drawing
+                elif kind == 'done':
+                    deleted_log = payload
+        except queue.Empty:
+            pass
+        if latest_count is not None:
+            update_delete_progress(latest_count, files)
+        if deleted_log is None:
+            app.after(50, pump_delete_events, files)
+            return
+        deletion_complete(deleted_log)
+
+    def update_delete_progress(count, files):
+        delete_progress['value'] = (count / len(files)) * 100 if files else 100
         status_label2.config(text=f'Files Deleted: {count}/{len(files)}')
         app.update_idletasks()
 
     # --- GUI Element Definitions ---
-    def deletion_complete():
+    def deletion_complete(deleted_log):
         output_text.delete(1.0, tk.END)
-        output_text.insert(tk.END, "\n\nUnused files have been deleted.")
+        insert_bulk("\n\nUnused files have been deleted.\n", "\n".join(deleted_log))
         delete_progress['value'] = 100
         delete_button.pack_forget()
         app.update_idletasks()